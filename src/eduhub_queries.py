@@ -1,24 +1,152 @@
-from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
+from pymongo import MongoClient, IndexModel, ReadPreference, UpdateOne, ASCENDING, DESCENDING
+from pymongo.cursor import Cursor
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.write_concern import WriteConcern
+from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+import logging
+import time
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the collection validators or data migrations below change
+SCHEMA_VERSION = 3
+
+DUPLICATE_KEY_ERROR = 11000
+
+DocId = Union[ObjectId, str]
+
+# Reference fields stored as ObjectId, per collection
+OBJECT_ID_FIELDS = {
+    "courses": ["instructorId"],
+    "enrollments": ["studentId", "courseId"]
+}
+
+# MongoClient options applied unless overridden through client_kwargs
+DEFAULT_CLIENT_OPTIONS = {
+    "appname": "eduhub",
+    "maxPoolSize": 20,
+    "minPoolSize": 2,
+    "maxIdleTimeMS": 30000,
+    "serverSelectionTimeoutMS": 3000,
+    "compressors": "zstd,snappy",
+    "retryWrites": True
+}
+
+# Fields left out of course list views
+COURSE_LIST_PROJECTION = {"description": 0, "syllabus": 0}
+
+# Case-insensitive collation shared by the email index and email lookups
+EMAIL_COLLATION = {"locale": "en", "strength": 2}
+
+EMAIL_INDEX = "email_1_ci"
+
+# Name of the (category, isPublished, createdAt) index built in create_indexes
+COURSE_CATEGORY_INDEX = "category_1_isPublished_1_createdAt_-1"
+
+COURSE_STATS_COLLECTION = "course_stats"
+
+# Holds the schema_version stamp; pymongo only allows db["_meta"], not db._meta
+META_COLLECTION = "_meta"
+
+ENROLLMENT_STATS_COLUMNS = [
+    "_id", "courseTitle", "totalEnrollments", "activeStudents", "enrollmentRate"
+]
+
+
+_MISSING = object()
+
+
+def to_object_id(value: DocId) -> ObjectId:
+    """Coerce a stringified ObjectId to ObjectId, leaving other values as-is"""
+    return ObjectId(value) if isinstance(value, str) else value
+
+
+def normalize_email(email):
+    """Trim and lowercase an email address, leaving non-strings untouched"""
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+def normalize_user_updates(updates: Dict) -> Dict:
+    """Return a copy of user updates with any email normalized"""
+    if "email" not in updates:
+        return updates
+    return {**updates, "email": normalize_email(updates["email"])}
+
+
+def try_object_id(value: DocId) -> Optional[ObjectId]:
+    """Like to_object_id, but return None for strings that aren't valid ObjectIds"""
+    try:
+        return to_object_id(value)
+    except InvalidId:
+        return None
+
+
+def get_field(doc: Dict, path: str):
+    """Resolve a dotted field path in a document, or _MISSING if absent"""
+    value = doc
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
 
 class EduHubDB:
-    def __init__(self, connection_string: str = 'mongodb://localhost:27017/'):
-        print("Initializing database connection...")
-        self.client = MongoClient(connection_string)
+    def __init__(self, connection_string: str = 'mongodb://localhost:27017/',
+                 client_kwargs: Optional[Dict] = None, **options):
+        """Connect to MongoDB and set up collections.
+
+        MongoClient options default to DEFAULT_CLIENT_OPTIONS and can be
+        overridden with client_kwargs or keyword arguments, e.g. maxPoolSize=1
+        for tests.
+        """
+        logger.debug("Initializing database connection...")
+        options = {**DEFAULT_CLIENT_OPTIONS, **(client_kwargs or {}), **options}
+        self.client = MongoClient(connection_string, **options)
         self.db = self.client['eduhub_db']
+        # Analytics reads tolerate slight staleness, so keep them off the primary
+        self.analytics_db = self.client.get_database(
+            self.db.name, read_preference=ReadPreference.SECONDARY_PREFERRED
+        )
         self.initialize_collections()
 
     def initialize_collections(self):
         """Initialize collections with validation rules"""
+        stamp = self.db[META_COLLECTION].find_one({"_id": "schema_version"})
+        if stamp and stamp.get("version") == SCHEMA_VERSION:
+            logger.debug("Collections already at schema version %s", SCHEMA_VERSION)
+            return
 
-        def setup_collection(name: str, schema: dict):
-            if name not in self.db.list_collection_names():
-                print(f"Creating collection: {name}")
-                self.db.create_collection(name)
-            print(f"Applying validation to collection: {name}")
-            self.db.command("collMod", name, validator=schema)
+        # One listCollections round-trip gives both names and current validators
+        existing = {
+            info["name"]: info.get("options", {})
+            for info in self.db.list_collections()
+        }
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Existing collections: %s", ", ".join(sorted(existing)))
+
+        # "moderate" keeps legacy documents that predate a schema change (e.g.
+        # unconvertible string ids) updatable; new and valid documents are
+        # still validated.
+        def setup_collection(name: str, schema: dict, existing: Dict[str, Dict]):
+            if name not in existing:
+                logger.debug("Creating collection: %s", name)
+                self.db.create_collection(
+                    name, validator=schema, validationLevel="moderate"
+                )
+                return
+            options = existing[name]
+            if (options.get("validator") == schema
+                    and options.get("validationLevel") == "moderate"):
+                return
+            logger.debug("Applying validation to collection: %s", name)
+            self.db.command(
+                "collMod", name, validator=schema, validationLevel="moderate"
+            )
 
     # Users schema
         user_schema = {
@@ -43,7 +171,7 @@ class EduHubDB:
                 "required": ["title", "instructorId", "category", "level"],
                 "properties": {
                     "title": {"bsonType": "string"},
-                    "instructorId": {"bsonType": "string"},
+                    "instructorId": {"bsonType": "objectId"},
                     "category": {"bsonType": "string"},
                     "level": {"enum": ["beginner", "intermediate", "advanced"]},
                     "price": {"bsonType": "double", "minimum": 0},
@@ -58,118 +186,524 @@ class EduHubDB:
                 "bsonType": "object",
                 "required": ["studentId", "courseId", "enrollmentDate"],
                 "properties": {
-                    "studentId": {"bsonType": "string"},
-                    "courseId": {"bsonType": "string"},
+                    "studentId": {"bsonType": "objectId"},
+                    "courseId": {"bsonType": "objectId"},
+                    "courseTitle": {"bsonType": "string"},
                     "enrollmentDate": {"bsonType": "date"},
                     "status": {"enum": ["active", "completed", "dropped"]}
                 }
             }
         }
 
-        setup_collection("users", user_schema)
-        setup_collection("courses", course_schema)
-        setup_collection("enrollments", enrollment_schema)
+        setup_collection("users", user_schema, existing)
+        setup_collection("courses", course_schema, existing)
+        setup_collection("enrollments", enrollment_schema, existing)
+        self.migrate_object_ids()
+        self.backfill_course_titles()
+
+        self.db[META_COLLECTION].update_one(
+            {"_id": "schema_version"},
+            {"$set": {"version": SCHEMA_VERSION}},
+            upsert=True
+        )
     
+    def migrate_object_ids(self):
+        """Convert reference fields still stored as strings to ObjectId.
+
+        Strings that aren't valid ObjectIds are left untouched. Validation is
+        bypassed so those leftovers don't abort the migration.
+        """
+        for collection, fields in OBJECT_ID_FIELDS.items():
+            for field in fields:
+                result = self.db[collection].update_many(
+                    {field: {"$type": "string"}},
+                    [{
+                        "$set": {
+                            field: {
+                                "$convert": {
+                                    "input": f"${field}",
+                                    "to": "objectId",
+                                    "onError": f"${field}"
+                                }
+                            }
+                        }
+                    }],
+                    bypass_document_validation=True
+                )
+                if result.modified_count:
+                    logger.debug("Converted %d %s.%s values to ObjectId",
+                                 result.modified_count, collection, field)
+
+    def backfill_course_titles(self):
+        """Copy course titles onto enrollments that don't carry courseTitle yet"""
+        self.db.enrollments.aggregate([
+            {"$match": {"courseTitle": {"$exists": False}}},
+            {
+                "$lookup": {
+                    "from": "courses",
+                    "localField": "courseId",
+                    "foreignField": "_id",
+                    "as": "course"
+                }
+            },
+            {"$unwind": "$course"},
+            {"$project": {"courseTitle": "$course.title"}},
+            {
+                "$merge": {
+                    "into": "enrollments",
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "discard"
+                }
+            }
+        ])
+
+    def normalize_emails(self):
+        """Trim and lowercase stored emails that predate write-time normalization.
+
+        Users whose normalized email collides with another account are left
+        as-is and logged; resolve them before building the email index.
+        """
+        stale = [
+            user for user in self.db.users.find({"email": {"$type": "string"}}, {"email": 1})
+            if normalize_email(user["email"]) != user["email"]
+        ]
+        if not stale:
+            return
+        ops = [
+            UpdateOne({"_id": user["_id"]}, {"$set": {"email": normalize_email(user["email"])}})
+            for user in stale
+        ]
+        try:
+            self.db.users.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            conflicts = [stale[err["index"]]["_id"] for err in errors]
+            logger.warning("Emails of users %s collide with other accounts when lowercased",
+                           conflicts)
+
     def create_indexes(self):
         """Create necessary indexes for performance optimization"""
         # Users indexes
-        self.db.users.create_index([("email", ASCENDING)], unique=True)
+        user_indexes = self.db.users.index_information()
+        legacy_email = user_indexes.get("email_1")
+        if EMAIL_INDEX not in user_indexes and not (legacy_email and "collation" in legacy_email):
+            self.normalize_emails()
+            # Build the case-insensitive index before dropping the old one so a
+            # failed build (case-variant duplicates) leaves emails protected
+            try:
+                self.db.users.create_index(
+                    [("email", ASCENDING)], unique=True, collation=EMAIL_COLLATION,
+                    name=EMAIL_INDEX
+                )
+            except OperationFailure as e:
+                logger.warning("Keeping the existing email index; case-insensitive "
+                               "build failed: %s", e)
+            else:
+                if legacy_email:
+                    self.db.users.drop_index("email_1")
         self.db.users.create_index([("role", ASCENDING)])
+        # Partial indexes: active directory listings and the small inactive set
+        self.db.users.create_index(
+            [("role", ASCENDING), ("dateJoined", DESCENDING)],
+            partialFilterExpression={"isActive": True}
+        )
+        self.db.users.create_index(
+            [("dateJoined", DESCENDING)],
+            partialFilterExpression={"isActive": False}
+        )
         
         # Courses indexes
         self.db.courses.create_index([("title", ASCENDING)])
-        self.db.courses.create_index([("category", ASCENDING)])
         self.db.courses.create_index([("tags", ASCENDING)])
+        # Compound indexes follow Equality -> Sort -> Range ordering
+        self.db.courses.create_index([
+            ("category", ASCENDING),
+            ("isPublished", ASCENDING),
+            ("createdAt", DESCENDING)
+        ])
+        self.db.courses.create_index([
+            ("instructorId", ASCENDING),
+            ("isPublished", ASCENDING)
+        ])
+        # The category compound index supersedes the old single-field one
+        if "category_1" in self.db.courses.index_information():
+            self.db.courses.drop_index("category_1")
+        # Published catalog queries are served by the category compound index;
+        # drop the partial duplicate earlier versions created
+        if "category_1_createdAt_-1" in self.db.courses.index_information():
+            self.db.courses.drop_index("category_1_createdAt_-1")
+        # Partial index for the unpublished review queue
+        self.db.courses.create_index(
+            [("createdAt", DESCENDING)],
+            partialFilterExpression={"isPublished": False}
+        )
         
         # Enrollments indexes
         self.db.enrollments.create_index([
             ("studentId", ASCENDING),
             ("courseId", ASCENDING)
         ], unique=True)
+        self.db.enrollments.create_index([("enrollmentDate", DESCENDING)])
+        self.db.enrollments.create_index([
+            ("courseId", ASCENDING),
+            ("status", ASCENDING),
+            ("enrollmentDate", DESCENDING)
+        ])
 
-    def add_user(self, user_data: Dict) -> str:
-        """Add a new user to the database"""
-        user_data['dateJoined'] = datetime.utcnow()
+    @staticmethod
+    def _prepare_user(user_data: Dict, now: datetime) -> Dict:
+        """Attach default fields to a user document"""
+        if 'email' in user_data:
+            user_data['email'] = normalize_email(user_data['email'])
+        user_data['dateJoined'] = now
         user_data['isActive'] = True
-        result = self.db.users.insert_one(user_data)
-        return str(result.inserted_id)
+        return user_data
 
-    def add_course(self, course_data: Dict) -> str:
-        """Add a new course to the database"""
-        course_data['createdAt'] = datetime.utcnow()
-        course_data['updatedAt'] = datetime.utcnow()
-        result = self.db.courses.insert_one(course_data)
-        return str(result.inserted_id)
-
-    def enroll_student(self, student_id: str, course_id: str) -> bool:
-        """Enroll a student in a course"""
-        enrollment = {
-            "studentId": student_id,
-            "courseId": course_id,
-            "enrollmentDate": datetime.utcnow(),
+    @staticmethod
+    def _prepare_course(course_data: Dict, now: datetime) -> Dict:
+        """Attach timestamp fields to a course document"""
+        if 'instructorId' in course_data:
+            course_data['instructorId'] = to_object_id(course_data['instructorId'])
+        # Keeps new courses inside the unpublished partial index
+        course_data.setdefault('isPublished', False)
+        course_data['createdAt'] = now
+        course_data['updatedAt'] = now
+        return course_data
+
+    @staticmethod
+    def _prepare_enrollment(student_id: DocId, course_id: DocId, now: datetime,
+                            course_title: str) -> Dict:
+        """Build an active enrollment document"""
+        return {
+            "studentId": to_object_id(student_id),
+            "courseId": to_object_id(course_id),
+            # Denormalized so enrollment stats don't need to join courses
+            "courseTitle": course_title,
+            "enrollmentDate": now,
             "status": "active"
         }
+
+    def _bulk_insert(self, name: str, docs: List[Dict], trusted: bool = False):
+        """Insert documents unordered in one round-trip.
+
+        trusted=True skips server-side schema validation and waits only for
+        the primary's acknowledgement. Documents that violate the schema are
+        then stored as-is, so reserve it for seed/ETL data already known to
+        conform.
+        """
+        if trusted:
+            collection = self.db.get_collection(name, write_concern=WriteConcern(w=1))
+        else:
+            collection = self.db[name]
+        return collection.insert_many(
+            docs, ordered=False, bypass_document_validation=trusted
+        )
+
+    def add_user(self, user_data: Dict) -> ObjectId:
+        """Add a new user to the database"""
+        user = self._prepare_user(user_data, datetime.utcnow())
+        result = self.db.users.insert_one(user)
+        return result.inserted_id
+
+    def find_user_by_email(self, email: str) -> Optional[Dict]:
+        """Look up a user by email, ignoring case, via the email index"""
+        return self.db.users.find_one(
+            {"email": normalize_email(email)}, collation=EMAIL_COLLATION
+        )
+
+    def add_users_bulk(self, users: List[Dict], trusted: bool = False) -> List[ObjectId]:
+        """Add many users in a single round-trip (see _bulk_insert for trusted)"""
+        if not users:
+            return []
+        now = datetime.utcnow()
+        docs = [self._prepare_user(user, now) for user in users]
+        result = self._bulk_insert("users", docs, trusted)
+        return result.inserted_ids
+
+    def add_course(self, course_data: Dict) -> ObjectId:
+        """Add a new course to the database"""
+        course = self._prepare_course(course_data, datetime.utcnow())
+        result = self.db.courses.insert_one(course)
+        return result.inserted_id
+
+    def add_courses_bulk(self, courses: List[Dict], trusted: bool = False) -> List[ObjectId]:
+        """Add many courses in a single round-trip (see _bulk_insert for trusted)"""
+        if not courses:
+            return []
+        now = datetime.utcnow()
+        docs = [self._prepare_course(course, now) for course in courses]
+        result = self._bulk_insert("courses", docs, trusted)
+        return result.inserted_ids
+
+    def enroll_student(self, student_id: DocId, course_id: DocId) -> bool:
+        """Enroll a student in a course; returns False if the course doesn't exist"""
+        student_id = try_object_id(student_id)
+        course_id = try_object_id(course_id)
+        if student_id is None or course_id is None:
+            return False
+        course = self.db.courses.find_one({"_id": course_id}, {"title": 1})
+        if course is None:
+            return False
+        enrollment = self._prepare_enrollment(
+            student_id, course_id, datetime.utcnow(), course["title"]
+        )
         result = self.db.enrollments.insert_one(enrollment)
         return result.acknowledged
 
-    def get_courses_by_category(self, category: str) -> List[Dict]:
-        """Get all courses in a specific category"""
-        return list(self.db.courses.find({"category": category}))
+    def enroll_students_bulk(self, pairs: List[Tuple[DocId, DocId]],
+                             assume_new: bool = True,
+                             trusted: bool = False) -> Tuple[int, List[Tuple[DocId, DocId]]]:
+        """Enroll many (student_id, course_id) pairs in a single round-trip.
+
+        With assume_new=False, pairs that are already enrolled are filtered
+        out with one query before inserting. Pairs with a malformed id or
+        whose course doesn't exist are rejected without being inserted. Duplicates that still reach the
+        server are rejected rather than failing the batch; any other write
+        error is re-raised. See _bulk_insert for trusted.
+        Returns the number of enrollments inserted and the rejected pairs.
+        """
+        parsed = [(try_object_id(s), try_object_id(c)) for s, c in pairs]
+        rejected = [
+            pair for pair, (s, c) in zip(pairs, parsed) if s is None or c is None
+        ]
+        pairs = [(s, c) for s, c in parsed if s is not None and c is not None]
+        if not assume_new and pairs:
+            existing = self.db.enrollments.find(
+                {"$or": [{"studentId": s, "courseId": c} for s, c in pairs]},
+                projection={"_id": 0, "studentId": 1, "courseId": 1}
+            )
+            enrolled = {(e["studentId"], e["courseId"]) for e in existing}
+            rejected += [pair for pair in pairs if pair in enrolled]
+            pairs = [pair for pair in pairs if pair not in enrolled]
+        if not pairs:
+            return 0, rejected
+
+        course_ids = list({c for _, c in pairs})
+        titles = {
+            course["_id"]: course["title"]
+            for course in self.db.courses.find({"_id": {"$in": course_ids}}, {"title": 1})
+        }
+        rejected += [pair for pair in pairs if pair[1] not in titles]
+        pairs = [pair for pair in pairs if pair[1] in titles]
+        if not pairs:
+            return 0, rejected
+        now = datetime.utcnow()
+        enrollments = [
+            self._prepare_enrollment(s, c, now, titles[c]) for s, c in pairs
+        ]
+        try:
+            result = self._bulk_insert("enrollments", enrollments, trusted)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            duplicates = [pairs[err["index"]] for err in errors]
+            logger.warning("Skipped %d duplicate enrollments: %s", len(duplicates), duplicates)
+            return e.details.get("nInserted", 0), rejected + duplicates
+        return len(result.inserted_ids), rejected
 
-    def get_course_details_with_instructor(self, course_id: str) -> Optional[Dict]:
+    def find_courses_by_category(self, category: str,
+                                 published: Optional[bool] = None,
+                                 sort: Optional[List[Tuple[str, int]]] = None,
+                                 projection: Optional[Dict] = None,
+                                 limit: Optional[int] = None,
+                                 skip: int = 0,
+                                 batch_size: Optional[int] = None,
+                                 hint: Optional[str] = None) -> Cursor:
+        """Build the cursor behind get_courses_by_category.
+
+        Pass hint=COURSE_CATEGORY_INDEX to pin the (category, isPublished,
+        createdAt) index when the planner picks a poorer one. The hinted index
+        must exist, so only do this once create_indexes has run.
+        """
+        query = {"category": category}
+        if published is not None:
+            query["isPublished"] = published
+        if projection is None:
+            projection = COURSE_LIST_PROJECTION
+        cursor = self.db.courses.find(query, projection=projection)
+        if hint:
+            cursor = cursor.hint(hint)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor
+
+    def get_courses_by_category(self, category: str,
+                                published: Optional[bool] = None,
+                                sort: Optional[List[Tuple[str, int]]] = None,
+                                projection: Optional[Dict] = None,
+                                limit: Optional[int] = None,
+                                skip: int = 0,
+                                batch_size: Optional[int] = None,
+                                hint: Optional[str] = None) -> List[Dict]:
+        """Get courses in a specific category.
+
+        Filtering on published and sorting by createdAt lets the query use
+        the (category, isPublished, createdAt) index without an in-memory sort.
+        Large text fields are left out unless a projection is given.
+        """
+        return list(self.find_courses_by_category(
+            category, published=published, sort=sort, projection=projection,
+            limit=limit, skip=skip, batch_size=batch_size, hint=hint
+        ))
+
+    def explain(self, cursor: Cursor) -> Dict:
+        """Return the query plan for a cursor, e.g. to check IXSCAN vs COLLSCAN"""
+        return cursor.explain()
+
+    def get_course_details_with_instructor(self, course_id: DocId) -> Optional[Dict]:
         """Get course details with instructor information"""
-        course = self.db.courses.find_one({"_id": course_id})
+        course_id = try_object_id(course_id)
+        if course_id is None:
+            return None
+        pipeline = [
+            {"$match": {"_id": course_id}},
+            {
+                "$lookup": {
+                    "from": "users",
+                    "localField": "instructorId",
+                    "foreignField": "_id",
+                    "as": "instructor"
+                }
+            },
+            {
+                "$unwind": {
+                    "path": "$instructor",
+                    "preserveNullAndEmptyArrays": True
+                }
+            },
+            {"$limit": 1}
+        ]
+        course = next(self.db.courses.aggregate(pipeline), None)
         if course:
-            instructor = self.db.users.find_one({"_id": course["instructorId"]})
+            instructor = course.pop("instructor", None)
             return {
                 "course": course,
                 "instructor": instructor
             }
         return None
 
-    def update_user_profile(self, user_id: str, updates: Dict) -> bool:
-        """Update user profile information"""
+    def rename_course(self, course_id: DocId, new_title: str) -> bool:
+        """Rename a course and its denormalized title on enrollments"""
+        course_id = try_object_id(course_id)
+        if course_id is None:
+            return False
+        result = self.db.courses.update_one(
+            {"_id": course_id},
+            {"$set": {"title": new_title, "updatedAt": datetime.utcnow()}}
+        )
+        self.db.enrollments.update_many(
+            {"courseId": course_id},
+            {"$set": {"courseTitle": new_title}}
+        )
+        return result.modified_count > 0
+
+    def update_user_profile(self, user_id: DocId, updates: Dict) -> bool:
+        """Update user profile information.
+
+        Fields whose stored value already matches are dropped from the $set,
+        so no-op updates don't rewrite the document or touch its indexes.
+        """
+        user_id = try_object_id(user_id)
+        if user_id is None:
+            return False
+        updates = normalize_user_updates(updates)
+        current = self.db.users.find_one({"_id": user_id}, projection=list(updates))
+        if current is None:
+            return False
+        changes = {
+            key: value for key, value in updates.items()
+            if get_field(current, key) != value
+        }
+        if not changes:
+            return False
         result = self.db.users.update_one(
             {"_id": user_id},
-            {"$set": updates}
+            {"$set": changes}
         )
         return result.modified_count > 0
 
-    def mark_course_as_published(self, course_id: str) -> bool:
+    def update_users_bulk(self, updates: List[Tuple[DocId, Dict]]) -> int:
+        """Apply many (user_id, updates) profile patches in a single round-trip.
+
+        Patches addressed to invalid ids are skipped.
+        """
+        ops = [
+            UpdateOne({"_id": user_id}, {"$set": normalize_user_updates(patch)})
+            for user_id, patch in ((try_object_id(u), p) for u, p in updates)
+            if user_id is not None and patch
+        ]
+        if not ops:
+            return 0
+        result = self.db.users.bulk_write(ops, ordered=False)
+        return result.modified_count
+
+    def mark_course_as_published(self, course_id: DocId) -> bool:
         """Mark a course as published"""
+        course_id = try_object_id(course_id)
+        if course_id is None:
+            return False
         result = self.db.courses.update_one(
             {"_id": course_id},
             {"$set": {"isPublished": True}}
         )
         return result.modified_count > 0
 
-    def get_course_enrollment_stats(self) -> pd.DataFrame:
-        """Get course enrollment statistics using aggregation"""
-        pipeline = [
+    def get_enrollment_count(self, course_id: DocId, status: Optional[str] = None) -> int:
+        """Count enrollments for one course, optionally by status.
+
+        Served by the (courseId, status, enrollmentDate) index; for stats across
+        all courses read the precomputed course_stats via get_course_stats.
+        """
+        course_id = try_object_id(course_id)
+        if course_id is None:
+            return 0
+        query = {"courseId": course_id}
+        if status:
+            query["status"] = status
+        return self.db.enrollments.count_documents(query)
+
+    @staticmethod
+    def _enrollment_filter_stages(match: Optional[Dict] = None,
+                                  since: Optional[datetime] = None) -> List[Dict]:
+        """Build the $match stages that narrow enrollments before grouping"""
+        stages = []
+        if match:
+            stages.append({"$match": match})
+        if since is not None:
+            stages.append({"$match": {"enrollmentDate": {"$gte": since}}})
+        return stages
+
+    @classmethod
+    def _course_enrollment_stats_pipeline(cls, match: Optional[Dict] = None,
+                                          since: Optional[datetime] = None) -> List[Dict]:
+        """Build the per-course enrollment statistics pipeline"""
+        pipeline = cls._enrollment_filter_stages(match, since)
+        pipeline += [
             {
                 "$group": {
+                    # Keyed on courseId alone so enrollments carrying a stale or
+                    # missing title still land in the course's single row
                     "_id": "$courseId",
+                    "courseTitle": {"$max": "$courseTitle"},
                     "totalEnrollments": {"$sum": 1},
                     "activeStudents": {
                         "$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}
                     }
                 }
             },
-            {
-                "$lookup": {
-                    "from": "courses",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "course"
-                }
-            },
-            {
-                "$unwind": "$course"
-            },
             {
                 "$project": {
-                    "courseId": 1,
-                    "courseTitle": "$course.title",
+                    "courseTitle": 1,
                     "totalEnrollments": 1,
                     "activeStudents": 1,
                     "enrollmentRate": {
@@ -178,9 +712,67 @@ class EduHubDB:
                 }
             }
         ]
-        
-        results = list(self.db.enrollments.aggregate(pipeline))
-        return pd.DataFrame(results)
+        return pipeline
+
+    def get_course_enrollment_stats(self, match: Optional[Dict] = None,
+                                    since: Optional[datetime] = None) -> pd.DataFrame:
+        """Get course enrollment statistics using aggregation.
+
+        match and since restrict the enrollments considered before grouping,
+        so the enrollment indexes can narrow the scan. Totals and active counts
+        come from one $group pass: splitting them into $facet branches would
+        not let either branch use an index, and would return every course in
+        a single document capped at 16MB.
+        """
+        pipeline = self._course_enrollment_stats_pipeline(match, since)
+        cursor = self.analytics_db.enrollments.aggregate(
+            pipeline, batchSize=1000, allowDiskUse=True
+        )
+        df = pd.DataFrame.from_records(cursor, columns=ENROLLMENT_STATS_COLUMNS)
+        return df.astype({
+            "totalEnrollments": "int32",
+            "activeStudents": "int32",
+            "enrollmentRate": "float32"
+        })
+
+    def refresh_course_stats(self):
+        """Rebuild the course_stats collection from all-time enrollment statistics.
+
+        $out swaps in the fresh results atomically, so courses that no longer
+        have enrollments drop out instead of keeping stale totals.
+        """
+        pipeline = self._course_enrollment_stats_pipeline()
+        pipeline.append({"$out": COURSE_STATS_COLLECTION})
+        self.db.enrollments.aggregate(pipeline, allowDiskUse=True)
+
+    def get_course_stats(self, course_id: Optional[DocId] = None) -> Union[Optional[Dict], List[Dict]]:
+        """Read precomputed enrollment statistics for one course, or all courses"""
+        stats = self.db[COURSE_STATS_COLLECTION]
+        if course_id is not None:
+            course_id = try_object_id(course_id)
+            return stats.find_one({"_id": course_id}) if course_id else None
+        return list(stats.find())
+
+    def watch_course_stats(self, debounce_seconds: float = 5.0):
+        """Keep course_stats current from an enrollments change stream.
+
+        Blocks until the stream closes and requires a replica set. Bursts of
+        changes are coalesced into at most one refresh per debounce_seconds;
+        changes still pending when the stream closes get a final refresh.
+        """
+        last_refresh = 0.0
+        pending = False
+        with self.db.enrollments.watch(max_await_time_ms=1000) as stream:
+            while stream.alive:
+                if stream.try_next() is not None:
+                    pending = True
+                now = time.monotonic()
+                if pending and now - last_refresh >= debounce_seconds:
+                    self.refresh_course_stats()
+                    last_refresh = now
+                    pending = False
+        if pending:
+            self.refresh_course_stats()
 
     def close_connection(self):
         """Close MongoDB connection"""
@@ -192,6 +784,13 @@ if __name__ == "__main__":
     # db.create_indexes()
     
     # Example operations
+    instructor_data = {
+        "email": "jane.smith@example.com",
+        "firstName": "Jane",
+        "lastName": "Smith",
+        "role": "instructor"
+    }
+
     user_data = {
         "email": "john.doe@example.com",
         "firstName": "John",
@@ -202,31 +801,15 @@ if __name__ == "__main__":
     course_data = {
         "title": "Introduction to Python",
         "description": "Learn Python programming from scratch",
-        "instructorId": "instructor123",
         "category": "Programming",
         "level": "beginner",
         "price": 99.99
     }
     
+    course_data["instructorId"] = db.add_user(instructor_data)
     user_id = db.add_user(user_data)
     course_id = db.add_course(course_data)
     
     db.enroll_student(user_id, course_id)
     
     db.close_connection()
-
-    def __init__(self, connection_string: str = 'mongodb://localhost:27017/'):
-        print("Initializing database connection...")
-        self.client = MongoClient(connection_string)
-        self.db = self.client['eduhub_db']
-        self.initialize_collections()
-
-    def initialize_collections(self):
-        """Initialize collections with validation rules"""
-
-        def setup_collection(name: str, schema: dict):
-            if name not in self.db.list_collection_names():
-                print(f"Creating collection: {name}")
-                self.db.create_collection(name)
-            print(f"Applying validation to collection: {name}")
-            self.db.command("collMod", name, validator=schema)
\ No newline at end of file